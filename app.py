@@ -13,80 +13,226 @@ Library:
   Creative Decisions Foundation — https://creativedecisions.net
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import numpy as np
+import orjson
+import bisect
+import functools
+import os
 import traceback
 
 # AhpAnpLib — Creative Decisions Foundation
 from AhpAnpLib.calcs_AHPLib import (
     priorityVector,
-    calcInconsistency,
     RI
 )
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Serialize responses with orjson; NumPy arrays and scalars natively.
+
+    Request parsing stays on the stdlib json inherited from DefaultJSONProvider.
+    """
+
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option | orjson.OPT_APPEND_NEWLINE
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, option=option), mimetype='application/json')
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 
+# ==============================================================
+# ERRORS
+# ==============================================================
+
+class InputError(ValueError):
+    """Invalid request field (matrix shape, item labels, ...); reported without a traceback."""
+
+
+def _error_response(e, **extra):
+    body = {'error': str(e), **extra}
+    # Formatting the traceback walks every frame; only do it when debugging
+    if not isinstance(e, InputError) and (app.debug or os.environ.get('AHP_TRACE')):
+        body['traceback'] = traceback.format_exc()
+    return jsonify(body), 400
+
+
+# ==============================================================
+# SDK CALCULATIONS
+# ==============================================================
+
+# Saaty random index, taken from AhpAnpLib's own table (n = 0..15)
+_RI_TABLE = tuple(float(RI(n)) for n in range(16))
+
+
+def _coerce_matrix(x):
+    """Build a C-contiguous float64 matrix and check that it is square."""
+    # Reject ragged JSON rows before NumPy fails on them deep in conversion
+    if isinstance(x, list):
+        n = len(x)
+        if not all(isinstance(row, list) and len(row) == n for row in x):
+            raise InputError(f'matrix must be square: expected {n} rows of {n} values')
+    m = np.ascontiguousarray(x, dtype=np.float64)
+    if m.ndim != 2 or m.shape[0] != m.shape[1]:
+        raise InputError(f'matrix must be square, got shape {m.shape}')
+    return m
+
+
+def _sdk_compute(matrix):
+    n = len(matrix)
+
+    if n == 1:
+        # Nothing to compare; the library formula would give CR = 0/0
+        weights = np.ones(1)
+        cr = 0.0
+    else:
+        if n == 2 and matrix[0, 1] > 0 and matrix[1, 0] > 0:
+            # Perron vector of the Harker-fixed [[1, a], [b, 1]] is
+            # (sqrt(a), sqrt(b)): what priorityVector converges to
+            weights = np.sqrt(np.array([matrix[0, 1], matrix[1, 0]]))
+            weights /= weights.sum()
+        else:
+            weights = priorityVector(matrix)
+
+        # CR exactly as calcInconsistency computes it, but reusing the vector
+        # above instead of running a second power iteration inside the library
+        ci_cols = (matrix.sum(axis=0) @ weights - n) / (n - 1)
+        cr = float(round(ci_cols / _RI_TABLE[min(n, 15)], 3))
+
+    weighted_sum = matrix @ weights
+    if np.all(matrix) and np.all(np.diag(matrix) == 1):
+        # Matrix equals its Harker-fixed form (no zeros, unit diagonal), so
+        # weights is its principal eigenvector and the Rayleigh quotient
+        # w.Mw / w.w equals mean(Mw / w) without the per-weight divide
+        lambda_max = float(np.dot(weights, weighted_sum) / np.dot(weights, weights))
+    else:
+        # harkerFix rewrote zeros or the diagonal, so weights belongs to a
+        # different matrix and the two forms disagree; keep mean(Mw / w),
+        # skipping zero weights so a degenerate input cannot yield inf
+        positive = weights > 0
+        lambda_max = float(np.mean(weighted_sum[positive] / weights[positive]))
+
+    return weights, cr, lambda_max
+
+
+# Only matrices up to the RI table size are cached, so keys stay small
+_CACHE_MAX_N = 15
+
+
+@functools.lru_cache(maxsize=512)
+def _sdk_cached(matrix_bytes, n):
+    matrix = np.frombuffer(matrix_bytes, dtype=float).reshape(n, n)
+    weights, cr, lambda_max = _sdk_compute(matrix)
+
+    # Shared between requests through the cache
+    weights.flags.writeable = False
+    return weights, cr, lambda_max
+
+
+def _sdk_analysis(matrix):
+    """AhpAnpLib weights, CR and lambda_max, cached by matrix contents."""
+    n = len(matrix)
+    if n > _CACHE_MAX_N:
+        return _sdk_compute(matrix)
+    return _sdk_cached(matrix.tobytes(), n)
+
+
 # ==============================================================
 # HEALTH CHECK
 # ==============================================================
 
-@app.route('/', methods=['GET'])
-def health():
+def _ahpanplib_available():
     try:
         test_matrix = np.array([[1, 2], [0.5, 1]])
         pv = priorityVector(test_matrix)
-        lib_ok = bool(len(pv) == 2 and abs(sum(pv) - 1.0) < 0.001)
+        return bool(len(pv) == 2 and abs(sum(pv) - 1.0) < 0.001)
     except Exception:
-        lib_ok = False
+        return False
 
-    return jsonify({
-        'status': 'ok',
-        'service': 'AHP-BOCR Validator',
-        'version': '2.0.0',
-        'library': 'AhpAnpLib (Creative Decisions Foundation)',
-        'library_reference': 'Mu, E. (2023). IJAHP, v.15, n.2. DOI: 10.13033/ijahp.v15i2.1163',
-        'ahpanplib_available': lib_ok
-    })
+
+# Static for the life of the process: built and serialized once at import
+_HEALTH_JSON = app.json.dumps({
+    'status': 'ok',
+    'service': 'AHP-BOCR Validator',
+    'version': '2.0.0',
+    'library': 'AhpAnpLib (Creative Decisions Foundation)',
+    'library_reference': 'Mu, E. (2023). IJAHP, v.15, n.2. DOI: 10.13033/ijahp.v15i2.1163',
+    'ahpanplib_available': _ahpanplib_available()
+}) + '\n'
+
+
+@app.route('/', methods=['GET'])
+def health():
+    return Response(_HEALTH_JSON, mimetype='application/json')
 
 
 # ==============================================================
 # VALIDATE SINGLE MATRIX
 # ==============================================================
 
+# Detail messages per band: < 0.1%, < 1%, otherwise
+_DIFF_THRESHOLDS = (0.001, 0.01)
+_DIFF_DETAILS = {
+    'Eigenvector': (
+        'Eigenvector: diferenca < 0.1% — EXCELENTE',
+        'Eigenvector: diferenca < 1% — VALIDO',
+        'Eigenvector: diferenca max {:.2f}% — VERIFICAR'
+    ),
+    'CR': (
+        'CR: diferenca < 0.1% — EXCELENTE',
+        'CR: diferenca < 1% — VALIDO',
+        'CR: diferenca {:.2f}% — VERIFICAR'
+    )
+}
+
+
+def _diff_detail(kind, diff):
+    band = bisect.bisect_right(_DIFF_THRESHOLDS, diff)
+    return _DIFF_DETAILS[kind][band].format(diff * 100)
+
+
 @app.route('/validate', methods=['POST'])
 def validate():
     try:
         data = request.json
-        matrix = np.array(data['matrix'], dtype=float)
+        matrix = _coerce_matrix(data['matrix'])
         items = data.get('items', [f'Item_{i}' for i in range(len(matrix))])
+        if len(items) < len(matrix):
+            raise InputError(f'items must have at least {len(matrix)} labels, got {len(items)}')
         your_weights = data.get('your_weights', [])
         your_cr = data.get('your_cr', None)
 
         n = len(matrix)
 
         # AhpAnpLib calculations
-        sdk_weights = priorityVector(matrix)
-        sdk_cr = float(calcInconsistency(matrix))
-        sdk_ri = float(RI(n)) if n <= 15 else None
-
-        # lambda_max
-        weighted_sum = matrix @ sdk_weights
-        sdk_lambda_max = float(np.mean(weighted_sum / sdk_weights))
+        sdk_weights, sdk_cr, sdk_lambda_max = _sdk_analysis(matrix)
+        sdk_ri = _RI_TABLE[n] if n < len(_RI_TABLE) else None
 
         # CI
         sdk_ci = (sdk_lambda_max - n) / (n - 1) if n > 1 else 0
 
+        sdk_rounded = np.round(sdk_weights, 6).tolist()
         result = {
             'sdk': {
                 'library': 'AhpAnpLib',
                 'version': '2.6.0',
                 'publisher': 'Creative Decisions Foundation',
                 'reference': 'Mu (2023), IJAHP v.15 n.2',
-                'weights': {items[i]: round(float(sdk_weights[i]), 6) for i in range(n)},
-                'weights_array': [round(float(w), 6) for w in sdk_weights],
+                'weights': dict(zip(items, sdk_rounded)),
+                'weights_array': sdk_rounded,
                 'cr': round(sdk_cr, 6),
                 'lambda_max': round(sdk_lambda_max, 6),
                 'ci': round(sdk_ci, 6),
@@ -101,16 +247,19 @@ def validate():
             your_w = np.array(your_weights, dtype=float)
             diff_weights = np.abs(sdk_weights - your_w)
             max_diff = float(np.max(diff_weights))
-            cr_diff = abs(sdk_cr - float(your_cr)) if your_cr is not None else 0
+            # Without a reported CR the comparison is against sdk_cr itself: diff 0
+            your_cr_val = float(your_cr) if your_cr is not None else sdk_cr
+            cr_diff = abs(sdk_cr - your_cr_val)
 
+            your_rounded = np.round(your_w, 6).tolist()
             result['your_system'] = {
-                'weights': {items[i]: round(float(your_w[i]), 6) for i in range(n)},
-                'weights_array': [round(float(w), 6) for w in your_w],
-                'cr': round(float(your_cr), 6) if your_cr is not None else None
+                'weights': dict(zip(items, your_rounded)),
+                'weights_array': your_rounded,
+                'cr': round(your_cr_val, 6) if your_cr is not None else None
             }
 
             result['comparison'] = {
-                'weight_differences': {items[i]: round(float(diff_weights[i]), 6) for i in range(n)},
+                'weight_differences': dict(zip(items, np.round(diff_weights, 6).tolist())),
                 'max_weight_diff': round(max_diff, 6),
                 'max_weight_diff_pct': round(max_diff * 100, 4),
                 'cr_diff': round(cr_diff, 6),
@@ -119,42 +268,101 @@ def validate():
             }
 
             result['valid'] = bool(max_diff < 0.01)
-            if max_diff < 0.001:
-                result['details'].append('Eigenvector: diferenca < 0.1% — EXCELENTE')
-            elif max_diff < 0.01:
-                result['details'].append('Eigenvector: diferenca < 1% — VALIDO')
-            else:
-                result['details'].append(f'Eigenvector: diferenca max {max_diff*100:.2f}% — VERIFICAR')
-
+            result['details'].append(_diff_detail('Eigenvector', max_diff))
             if your_cr is not None:
-                if cr_diff < 0.001:
-                    result['details'].append('CR: diferenca < 0.1% — EXCELENTE')
-                elif cr_diff < 0.01:
-                    result['details'].append('CR: diferenca < 1% — VALIDO')
-                else:
-                    result['details'].append(f'CR: diferenca {cr_diff*100:.2f}% — VERIFICAR')
+                result['details'].append(_diff_detail('CR', cr_diff))
 
         return jsonify(result)
 
     except Exception as e:
-        return jsonify({
-            'error': str(e),
-            'traceback': traceback.format_exc(),
-            'valid': False
-        }), 400
+        return _error_response(e, valid=False)
 
 
 # ==============================================================
 # VALIDATE FULL PROJECT
 # ==============================================================
 
+_CITATION = 'Mu, E. (2023). Creative Decisions Foundation Announces the Release of AHP/ANP Python Library. IJAHP, v.15, n.2. DOI: 10.13033/ijahp.v15i2.1163'
+
+
+def _project_matrix(name, matrix_data, summary):
+    """Validate one project matrix against AhpAnpLib, folding it into summary."""
+    matrix = _coerce_matrix(matrix_data['matrix'])
+    items = matrix_data.get('items')
+    your_weights = matrix_data.get('your_weights', [])
+    your_cr = matrix_data.get('your_cr', None)
+
+    n = len(matrix)
+    sdk_weights, sdk_cr, sdk_lmax = _sdk_analysis(matrix)
+
+    summary['total_matrices'] += 1
+
+    mat_result = {
+        'sdk_weights': np.round(sdk_weights, 6),
+        'sdk_cr': round(sdk_cr, 6),
+        'sdk_lambda_max': round(sdk_lmax, 6),
+        'items': items if items else [f'Item_{i}' for i in range(n)],
+        'n': n,
+        'valid': True
+    }
+
+    if your_weights and len(your_weights) == n:
+        your_w = np.array(your_weights, dtype=float)
+        diff = np.abs(sdk_weights - your_w)
+        max_diff = float(np.max(diff))
+        your_cr_val = float(your_cr) if your_cr is not None else sdk_cr
+        cr_diff = abs(sdk_cr - your_cr_val)
+
+        mat_result['your_weights'] = np.round(your_w, 6)
+        mat_result['your_cr'] = round(your_cr_val, 6) if your_cr is not None else None
+        mat_result['max_weight_diff'] = round(max_diff, 6)
+        mat_result['cr_diff'] = round(cr_diff, 6)
+        mat_result['valid'] = bool(max_diff < 0.01)
+
+        summary['max_weight_diff'] = max(summary['max_weight_diff'], max_diff)
+        summary['max_cr_diff'] = max(summary['max_cr_diff'], cr_diff)
+
+        if max_diff < 0.01:
+            summary['valid_matrices'] += 1
+        else:
+            summary['issues'].append(f'{name}: diff={max_diff*100:.2f}%')
+    else:
+        mat_result['sdk_only'] = True
+        summary['valid_matrices'] += 1
+
+    return mat_result
+
+
+def _project_totals(summary):
+    summary['max_weight_diff'] = round(summary['max_weight_diff'], 6)
+    summary['max_cr_diff'] = round(summary['max_cr_diff'], 6)
+    return {
+        'summary': summary,
+        'all_valid': not summary['issues'],
+        'library': 'AhpAnpLib (Creative Decisions Foundation)',
+        'citation': _CITATION
+    }
+
+
+def _stream_project(matrices, summary):
+    """NDJSON body: one line per matrix as it is validated, then the totals."""
+    option = app.json.option | orjson.OPT_APPEND_NEWLINE
+    try:
+        for name, matrix_data in matrices.items():
+            mat_result = _project_matrix(name, matrix_data, summary)
+            yield orjson.dumps({'name': name, 'result': mat_result}, option=option)
+    except Exception as e:
+        # Headers are already sent; report the failure in-band
+        yield orjson.dumps({'error': str(e)}, option=option)
+        return
+    yield orjson.dumps(_project_totals(summary), option=option)
+
+
 @app.route('/validate-project', methods=['POST'])
 def validate_project():
     try:
         data = request.json
         matrices = data.get('matrices', {})
-        results = {}
-        all_valid = True
         summary = {
             'total_matrices': 0,
             'valid_matrices': 0,
@@ -163,75 +371,18 @@ def validate_project():
             'issues': []
         }
 
-        for name, matrix_data in matrices.items():
-            matrix = np.array(matrix_data['matrix'], dtype=float)
-            items = matrix_data.get('items', [])
-            your_weights = matrix_data.get('your_weights', [])
-            your_cr = matrix_data.get('your_cr', None)
-
-            n = len(matrix)
-            sdk_weights = priorityVector(matrix)
-            sdk_cr = float(calcInconsistency(matrix))
-
-            weighted_sum = matrix @ sdk_weights
-            sdk_lmax = float(np.mean(weighted_sum / sdk_weights))
-
-            summary['total_matrices'] += 1
-
-            mat_result = {
-                'sdk_weights': [round(float(w), 6) for w in sdk_weights],
-                'sdk_cr': round(sdk_cr, 6),
-                'sdk_lambda_max': round(sdk_lmax, 6),
-                'items': items,
-                'n': n,
-                'valid': True
-            }
-
-            if your_weights and len(your_weights) == n:
-                your_w = np.array(your_weights, dtype=float)
-                diff = np.abs(sdk_weights - your_w)
-                max_diff = float(np.max(diff))
-                cr_diff = abs(sdk_cr - float(your_cr)) if your_cr is not None else 0
-
-                mat_result['your_weights'] = [round(float(w), 6) for w in your_w]
-                mat_result['your_cr'] = round(float(your_cr), 6) if your_cr is not None else None
-                mat_result['max_weight_diff'] = round(max_diff, 6)
-                mat_result['cr_diff'] = round(cr_diff, 6)
-                mat_result['valid'] = bool(max_diff < 0.01)
-
-                summary['max_weight_diff'] = max(summary['max_weight_diff'], max_diff)
-                summary['max_cr_diff'] = max(summary['max_cr_diff'], cr_diff)
-
-                if max_diff < 0.01:
-                    summary['valid_matrices'] += 1
-                else:
-                    all_valid = False
-                    summary['issues'].append(f'{name}: diff={max_diff*100:.2f}%')
-            else:
-                mat_result['sdk_only'] = True
-                summary['valid_matrices'] += 1
+        accept = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+        if accept == 'application/x-ndjson':
+            return Response(_stream_project(matrices, summary), mimetype='application/x-ndjson')
 
-            results[name] = mat_result
-
-        return jsonify({
-            'results': results,
-            'summary': {
-                'total_matrices': summary['total_matrices'],
-                'valid_matrices': summary['valid_matrices'],
-                'max_weight_diff': round(summary['max_weight_diff'], 6),
-                'max_cr_diff': round(summary['max_cr_diff'], 6),
-                'issues': summary['issues']
-            },
-            'all_valid': bool(all_valid),
-            'library': 'AhpAnpLib (Creative Decisions Foundation)',
-            'citation': 'Mu, E. (2023). Creative Decisions Foundation Announces the Release of AHP/ANP Python Library. IJAHP, v.15, n.2. DOI: 10.13033/ijahp.v15i2.1163'
-        })
+        results = {
+            name: _project_matrix(name, matrix_data, summary)
+            for name, matrix_data in matrices.items()
+        }
+        return jsonify({'results': results, **_project_totals(summary)})
 
     except Exception as e:
-        return jsonify({
-            'error': str(e),
-            'traceback': traceback.format_exc()
-        }), 400
+        return _error_response(e)
 
 
 # ==============================================================
@@ -242,21 +393,21 @@ def validate_project():
 def calculate():
     try:
         data = request.json
-        matrix = np.array(data['matrix'], dtype=float)
+        matrix = _coerce_matrix(data['matrix'])
         items = data.get('items', [f'Item_{i}' for i in range(len(matrix))])
+        if len(items) < len(matrix):
+            raise InputError(f'items must have at least {len(matrix)} labels, got {len(items)}')
         n = len(matrix)
 
-        weights = priorityVector(matrix)
-        cr = float(calcInconsistency(matrix))
-        ri = float(RI(n)) if n <= 15 else None
+        weights, cr, lmax = _sdk_analysis(matrix)
+        ri = _RI_TABLE[n] if n < len(_RI_TABLE) else None
 
-        weighted_sum = matrix @ weights
-        lmax = float(np.mean(weighted_sum / weights))
         ci = (lmax - n) / (n - 1) if n > 1 else 0
 
+        rounded = np.round(weights, 6).tolist()
         return jsonify({
-            'weights': {items[i]: round(float(weights[i]), 6) for i in range(n)},
-            'weights_array': [round(float(w), 6) for w in weights],
+            'weights': dict(zip(items, rounded)),
+            'weights_array': rounded,
             'cr': round(cr, 6),
             'ci': round(ci, 6),
             'lambda_max': round(lmax, 6),
@@ -270,7 +421,7 @@ def calculate():
         return jsonify({'error': str(e)}), 400
 
 
+# Development server only; production runs gunicorn -c gunicorn_conf.py app:app
 if __name__ == '__main__':
-    import os
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for the AHP-BOCR Validator.
+
+  gunicorn -c gunicorn_conf.py app:app
+
+PORT (Railway) and WEB_CONCURRENCY override the bind port and worker count.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# CPUs this process may run on; cpu_count() reports the whole host
+# inside a container
+try:
+    _cpus = len(os.sched_getaffinity(0))
+except AttributeError:
+    _cpus = os.cpu_count() or 1
+
+# Every worker imports AhpAnpLib (pandas, matplotlib, ...) and keeps its
+# own result cache, so the default stays small
+_MAX_WORKERS = 4
+
+# AhpAnpLib's power iteration is Python-level and holds the GIL, so
+# parallelism comes from processes; threads overlap request I/O
+workers = int(os.environ.get('WEB_CONCURRENCY', min(_cpus * 2 + 1, _MAX_WORKERS)))
+worker_class = 'gthread'
+threads = 2